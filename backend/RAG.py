@@ -1,67 +1,288 @@
-import pandas as pd
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'true')
+
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 import faiss
+import torch
 from sentence_transformers import SentenceTransformer
+from sentence_transformers.models import Normalize
+from transformers import AutoTokenizer, PreTrainedTokenizerFast
 from typing import List
 from config import config
 
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+logger = logging.getLogger(__name__)
+
 DS_PATH = config.DATASET_PATH
+INDEX_CACHE_DIR = config.INDEX_CACHE_DIR
+ENCODER_ONNX_DIR = config.ENCODER_ONNX_DIR
+MODEL_NAME = 'cointegrated/rubert-tiny2'
+ONNX_MODEL_FILE = 'model_quantized.onnx'
+INDEX_VERSION = 'hnsw32-sq8-flat-npy'
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 40
+HNSW_EF_SEARCH = 16
+BRUTE_FORCE_MAX_ROWS = 100_000
+
+TEXT_COLUMNS = ['Event Name', 'Description', 'Category', 'Location']
+
+_INSTANCE = None
+_INSTANCE_LOCK = threading.Lock()
+
+class OnnxSentenceEncoder:
+    def __init__(self, model_dir: str, max_length: int = 512):
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir, use_fast=True)
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, ONNX_MODEL_FILE),
+            providers=['CPUExecutionProvider']
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.max_length = max_length
+
+    def encode(self, sentences: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        tokenized = self.tokenizer(list(sentences), truncation=True, max_length=self.max_length)
+        batches = []
+        for start in range(0, len(sentences), batch_size):
+            encoded = self.tokenizer.pad(
+                {k: v[start:start + batch_size] for k, v in tokenized.items()},
+                return_tensors='np'
+            )
+            feeds = {k: v.astype(np.int64) for k, v in encoded.items() if k in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            mask = encoded['attention_mask'][..., None].astype(np.float32)
+            batches.append((hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None))
+        return np.vstack(batches)
+
+def _export_onnx_encoder(model_dir: str):
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    model = ORTModelForFeatureExtraction.from_pretrained(MODEL_NAME, export=True)
+    model.save_pretrained(model_dir)
+    AutoTokenizer.from_pretrained(MODEL_NAME, use_fast=True).save_pretrained(model_dir)
+
+    quantizer = ORTQuantizer.from_pretrained(model)
+    qconfig = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=model_dir, quantization_config=qconfig)
+
+def _configure_torch_threads():
+    torch.set_num_threads(os.cpu_count() or config.MAX_WORKERS)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    logger.info(f"Torch intra-op threads: {torch.get_num_threads()}")
+
+def _strip_encoder(model: SentenceTransformer):
+    if not isinstance(model.tokenizer, PreTrainedTokenizerFast):
+        model.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, use_fast=True)
+    for name, module in list(model._modules.items()):
+        if isinstance(module, Normalize):
+            del model._modules[name]
+
+def _compile_encoder(model: SentenceTransformer, device: str):
+    if not hasattr(torch, 'compile'):
+        return
+    transformer = model[0]
+    eager = transformer.auto_model
+    try:
+        mode = 'reduce-overhead' if device == 'cuda' else 'default'
+        transformer.auto_model = torch.compile(eager, mode=mode, dynamic=True)
+        model.encode(['прогрев'], show_progress_bar=False)
+    except Exception as e:
+        logger.warning(f"torch.compile failed, using eager encoder: {e}")
+        transformer.auto_model = eager
+
+def _write_atomic(path: str, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-', suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _load_encoder(device: str, onnx_dir: str = ENCODER_ONNX_DIR):
+    if device == 'cpu' and ort is not None:
+        try:
+            if not os.path.exists(os.path.join(onnx_dir, ONNX_MODEL_FILE)):
+                _export_onnx_encoder(onnx_dir)
+            return OnnxSentenceEncoder(onnx_dir), 'onnx-int8'
+        except Exception as e:
+            logger.warning(f"ONNX encoder unavailable, falling back to PyTorch: {e}")
+    model = SentenceTransformer(MODEL_NAME, device=device)
+    _strip_encoder(model)
+    kind = 'torch'
+    if device == 'cuda':
+        model = model.half()
+        kind = 'torch-fp16'
+    _compile_encoder(model, device)
+    return model, kind
 
 class ITEventSemanticSearch:
-    def __init__(self, csv_path: str):
-        self.df = pd.read_csv(csv_path, sep=',', encoding='utf-8')
-        
-        text_columns = ['Event Name', 'Description', 'Category', 'Location']
-        for col in text_columns:
-            if col in self.df.columns:
-                self.df[col] = self.df[col].fillna('').astype(str)
-        
-        self.df['search_text'] = (
-            self.df['Event Name'] + ". " +
-            self.df['Description'] + ". " +
-            self.df.get('Category', '') + ". " +
-            self.df.get('Location', '')
+    def __init__(self, csv_path: str, cache_dir: str = INDEX_CACHE_DIR):
+        _configure_torch_threads()
+        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.model, self.encoder_kind = _load_encoder(self.device)
+
+        cache_key = self._cache_key(csv_path, self.encoder_kind)
+        self.index_path = os.path.join(cache_dir, f"{cache_key}.faiss")
+        self.vectors_path = os.path.join(cache_dir, f"{cache_key}.npy")
+        self.meta_path = os.path.join(cache_dir, f"{cache_key}.parquet")
+
+        self.index = None
+        self.vectors = None
+        self.embeddings = None
+        has_vectors = os.path.exists(self.vectors_path) or os.path.exists(self.index_path)
+        if has_vectors and os.path.exists(self.meta_path):
+            names = pq.read_table(self.meta_path, columns=['Event Name']).column('Event Name')
+            self.names = np.array(names.to_pylist(), dtype=object)
+            if os.path.exists(self.vectors_path):
+                self.vectors = np.load(self.vectors_path, mmap_mode='r')
+            else:
+                self.index = faiss.read_index(self.index_path)
+        else:
+            embeddings = self._build_embeddings(csv_path)
+
+            os.makedirs(cache_dir, exist_ok=True)
+            if len(embeddings) <= BRUTE_FORCE_MAX_ROWS:
+                _write_atomic(self.vectors_path, lambda path: np.save(path, embeddings))
+                self.vectors = np.load(self.vectors_path, mmap_mode='r')
+            else:
+                self._build_vector_index(embeddings)
+                _write_atomic(self.index_path, lambda path: faiss.write_index(self.index, path))
+            meta = pa.table({'Event Name': self.names.tolist()})
+            _write_atomic(self.meta_path, lambda path: pq.write_table(meta, path))
+
+        if self.device == 'cuda':
+            if self.vectors is not None:
+                self.embeddings = torch.from_numpy(np.array(self.vectors)).to(self.device)
+                self.vectors = None
+            else:
+                self._move_index_to_gpu()
+
+    def _move_index_to_gpu(self):
+        if faiss.get_num_gpus() == 0:
+            return
+        try:
+            self.gpu_resources = faiss.StandardGpuResources()
+            self.index = faiss.index_cpu_to_gpu(self.gpu_resources, 0, self.index)
+        except (AttributeError, RuntimeError) as e:
+            logger.warning(f"Keeping FAISS index on CPU: {e}")
+
+    @staticmethod
+    def _cache_key(csv_path: str, encoder_kind: str) -> str:
+        with open(csv_path, 'rb') as f:
+            digest = hashlib.md5(f.read())
+        digest.update(f"{MODEL_NAME}:{encoder_kind}:{INDEX_VERSION}".encode('utf-8'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _iter_text_batches(csv_path: str):
+        reader = pa_csv.open_csv(
+            csv_path,
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=TEXT_COLUMNS,
+                include_missing_columns=True,
+                column_types={col: pa.string() for col in TEXT_COLUMNS}
+            )
         )
-        
-        self.model = SentenceTransformer('cointegrated/rubert-tiny2')
-        
-        self._build_vector_index()
+        seen_names = set()
+        for batch in reader:
+            columns = [[value or '' for value in batch.column(col).to_pylist()] for col in TEXT_COLUMNS]
+            rows = []
+            for row in zip(*columns):
+                if row[0] not in seen_names:
+                    seen_names.add(row[0])
+                    rows.append(row)
+            if rows:
+                yield [row[0] for row in rows], ['. '.join(row) for row in rows]
+
+    def _encode_corpus(self, texts: List[str]) -> np.ndarray:
+        order = np.argsort([len(t) for t in texts], kind='stable')
+        sorted_embeddings = self.model.encode([texts[i] for i in order], batch_size=64, show_progress_bar=False)
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[order] = sorted_embeddings
+        return embeddings
     
-    def _build_vector_index(self):
-        texts = self.df['search_text'].tolist()
-        embeddings = self.model.encode(texts, batch_size=32, show_progress_bar=False)
+    def _build_embeddings(self, csv_path: str) -> np.ndarray:
+        names = []
+        texts = []
+        for batch_names, batch_texts in self._iter_text_batches(csv_path):
+            names.extend(batch_names)
+            texts.extend(batch_texts)
+        self.names = np.array(names, dtype=object)
+        embeddings = self._encode_corpus(texts)
         
-        embeddings = embeddings.astype(np.float32)
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
         faiss.normalize_L2(embeddings)
-        
+        return embeddings
+    
+    def _build_vector_index(self, embeddings: np.ndarray):
         dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatIP(dimension)
+        self.index = faiss.IndexHNSWSQ(
+            dimension, faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT
+        )
+        self.index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        self.index.hnsw.efSearch = HNSW_EF_SEARCH
+        self.index.train(embeddings)
         self.index.add(embeddings)
     
     def search(self, query: str, top_k: int = 5) -> List[str]:
         if not isinstance(query, str) or len(query.strip()) < 2:
             return []
         
-        query = query.strip()
-        query_embedding = self.model.encode([query], convert_to_numpy=True)
+        query_embedding = self.model.encode([query.strip()], convert_to_numpy=True, show_progress_bar=False)
         query_embedding = query_embedding.astype(np.float32)
         faiss.normalize_L2(query_embedding)
         
-        distances, indices = self.index.search(query_embedding, top_k)
+        indices = self._nearest(query_embedding, top_k)
         
-        results = []
-        seen_events = set()
-        for idx in indices[0]:
-            if 0 <= idx < len(self.df):
-                event_name = self.df.iloc[idx]['End Date']
-                if event_name and event_name not in seen_events:
-                    seen_events.add(event_name)
-                    results.append(event_name)
-                    if len(results) >= top_k:
-                        break
-
-        return results[:top_k]
+        valid = indices[(indices >= 0) & (indices < len(self.names))]
+        return [name for name in self.names[valid] if name][:top_k]
+
+    def _nearest(self, query_embedding: np.ndarray, top_k: int) -> np.ndarray:
+        if self.vectors is not None:
+            scores = self.vectors @ query_embedding[0]
+            k = min(top_k, len(scores))
+            if k == 0:
+                return np.empty(0, dtype=np.int64)
+            top = np.argpartition(-scores, k - 1)[:k]
+            return top[np.argsort(-scores[top])]
+
+        if self.embeddings is None:
+            _, indices = self.index.search(query_embedding, top_k)
+            return indices[0]
+
+        query = torch.from_numpy(query_embedding).to(self.device)
+        scores = query @ self.embeddings.T
+        _, indices = torch.topk(scores, min(top_k, scores.shape[1]), dim=1)
+        return indices[0].cpu().numpy()
+
+def _get_instance() -> ITEventSemanticSearch:
+    global _INSTANCE
+    if _INSTANCE is None:
+        with _INSTANCE_LOCK:
+            if _INSTANCE is None:
+                _INSTANCE = ITEventSemanticSearch(DS_PATH)
+    return _INSTANCE
 
 def run_RAG(QUERY):
-    answer = ITEventSemanticSearch(DS_PATH).search(QUERY)
+    answer = _get_instance().search(QUERY)
     return answer
@@ -11,6 +11,10 @@ class Config:
     
     DATASET_PATH = str(BASE_DIR / 'data' / 'dataset-it-profession.csv')
     
+    INDEX_CACHE_DIR = os.getenv('INDEX_CACHE_DIR', str(BASE_DIR / 'data' / 'index_cache'))
+    
+    ENCODER_ONNX_DIR = os.getenv('ENCODER_ONNX_DIR', str(BASE_DIR / 'data' / 'encoder_onnx'))
+    
     MODEL_PATH = str(BASE_DIR / 'gemma-3-1b-it-Q4_K_M.gguf')
     
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
@@ -21,12 +25,13 @@ class Config:
     MAX_WORKERS = 4
     TIMEOUT_SECONDS = 30
     
-    if not TELEGRAM_BOT_TOKEN:
-        raise ValueError("TELEGRAM_BOT_TOKEN environment variable is required")
-    
-    if not os.path.exists(MODEL_PATH):
-        raise FileNotFoundError(f"Model file not found at {MODEL_PATH}")
-    
-    os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
+    def validate(self):
+        if not self.TELEGRAM_BOT_TOKEN:
+            raise ValueError("TELEGRAM_BOT_TOKEN environment variable is required")
+        
+        if not os.path.exists(self.MODEL_PATH):
+            raise FileNotFoundError(f"Model file not found at {self.MODEL_PATH}")
+        
+        os.makedirs(os.path.dirname(self.LOG_FILE), exist_ok=True)
 
 config = Config()
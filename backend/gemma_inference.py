@@ -155,6 +155,22 @@ def LLM_FUNCTION(query):
         logger.critical(f"CRITICAL ERROR in LLM_FUNCTION: {e}", exc_info=True)
         return None
 
+def LLM_FUNCTION_SEQUENTIAL(queries):
+    try:
+        logger.info(f"Processing {len(queries)} queries on one engine...")
+        engine = FixedGemmaEngine()
+        results = [
+            engine.generate(query, max_tokens=256, temperature=0.7)
+            for query in queries
+        ]
+        engine.shutdown()
+        logger.info("Queries processed successfully")
+        return results
+        
+    except Exception as e:
+        logger.critical(f"CRITICAL ERROR in LLM_FUNCTION_SEQUENTIAL: {e}", exc_info=True)
+        return [None] * len(queries)
+
 def GET_LLM_ANSWER(query):
     try:
         logger.info("=== LLM PROCESSING ===")
@@ -166,3 +182,17 @@ def GET_LLM_ANSWER(query):
     except Exception as e:
         logger.critical(f"CRITICAL ERROR in GET_LLM_ANSWER: {e}", exc_info=True)
         sys.exit(1)
+
+def GET_LLM_ANSWERS(queries):
+    if not queries:
+        return []
+    try:
+        logger.info(f"=== LLM PROCESSING ({len(queries)} queries) ===")
+        results = LLM_FUNCTION_SEQUENTIAL(queries)
+        gc.collect()
+        logger.info("=== PROCESSING COMPLETE ===")
+        return results
+                
+    except Exception as e:
+        logger.critical(f"CRITICAL ERROR in GET_LLM_ANSWERS: {e}", exc_info=True)
+        sys.exit(1)
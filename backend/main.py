@@ -1,22 +1,29 @@
 import os
+import sys
 import uuid
 import re
+import time
 import asyncio
-from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict, fields
+from datetime import datetime, timezone
 import aiosqlite
-from aiogram import Bot, Dispatcher, types
+from aiogram import Bot, Dispatcher, F, types
 from aiogram.filters import Command
+from aiogram.filters.callback_data import CallbackData
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import Message
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from dotenv import load_dotenv
-from parser import GET_EVENTS
+from parser import GET_EVENTS, shutdown as shutdown_parser
 from RAG import run_RAG
 from config import config
 
 load_dotenv()
+config.validate()
 
 MANAGING_POSITIONS = [
     "директор", "генеральный директор", "ceo", "руководитель", 
@@ -24,14 +31,60 @@ MANAGING_POSITIONS = [
     "управляющий", "управляющий директор", "начальник", "шеф",
     "владелец", "собственник", "founder", "основатель"
 ]
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$')
+_MGR_RE = re.compile("|".join(re.escape(p) for p in MANAGING_POSITIONS), re.IGNORECASE)
+
+K_NAME = sys.intern("Event Name")
+K_START = sys.intern("Start Date")
+K_END = sys.intern("End Date")
+K_YEAR = sys.intern("Year")
+K_LOCATION = sys.intern("Location")
+K_TYPE = sys.intern("Event Type")
+K_DESCRIPTION = sys.intern("Description")
+K_SPEAKERS = sys.intern("Speakers/Organizers")
+K_PARTICIPANTS = sys.intern("Participants Count")
+K_CATEGORY = sys.intern("Category")
 
 DB_PATH = config.DATABASE_PATH
+MESSAGE_LIMIT = 4096
 BOT_TOKEN = config.TELEGRAM_BOT_TOKEN
 
 bot = Bot(token=BOT_TOKEN)
 storage = MemoryStorage()
 dp = Dispatcher(storage=storage)
 
+DB: aiosqlite.Connection = None
+
+USER_CACHE_TTL = 60.0
+USER_CACHE_MAX = 1000
+_USER_CACHE: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+_USER_CACHE_LOCKS: dict[int, asyncio.Lock] = {}
+
+EVENTS_CACHE_TTL = 600.0
+RAG_CACHE_TTL = 3600.0
+RESULT_CACHE_MAX = 256
+_RESULT_CACHE: OrderedDict[tuple[str, str], tuple[float, object]] = OrderedDict()
+_RESULT_INFLIGHT: dict[tuple[str, str], asyncio.Task] = {}
+
+RAG_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag")
+
+@dataclass
+class RegDraft:
+    full_name: str = ""
+    email: str = ""
+    company_name: str = ""
+    position: str = ""
+    
+    @classmethod
+    def from_data(cls, data: dict) -> "RegDraft":
+        return cls(**{f.name: data[f.name] for f in fields(cls) if f.name in data})
+
+class SearchCB(CallbackData, prefix="sbp"):
+    kind: int
+
+SEARCH_BY_POSITION = 0
+SEARCH_CUSTOM = 1
+
 class RegistrationStates(StatesGroup):
     waiting_for_full_name = State()
     waiting_for_email = State()
@@ -44,96 +97,186 @@ class RegistrationStates(StatesGroup):
     waiting_for_single_employee_event = State()
 
 async def init_db():
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                full_name TEXT NOT NULL,
-                email TEXT NOT NULL,
-                company_name TEXT NOT NULL,
-                position TEXT NOT NULL,
-                unique_id TEXT NOT NULL UNIQUE,
-                registration_date TEXT NOT NULL,
-                username TEXT,
-                calendar TEXT DEFAULT ''
-            )
-        ''')
-        
-        try:
-            await db.execute("ALTER TABLE users ADD COLUMN company_name TEXT DEFAULT ''")
-        except aiosqlite.OperationalError:
-            pass
-            
-        try:
-            await db.execute("ALTER TABLE users ADD COLUMN calendar TEXT DEFAULT ''")
-        except aiosqlite.OperationalError:
-            pass
+    global DB
+    DB = await aiosqlite.connect(DB_PATH)
+    DB.row_factory = aiosqlite.Row
+    await DB.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-64000;
+        PRAGMA busy_timeout=5000;
+    """)
+    
+    await DB.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            full_name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            company_name TEXT NOT NULL,
+            position TEXT NOT NULL,
+            unique_id TEXT NOT NULL UNIQUE,
+            registration_date TEXT NOT NULL,
+            username TEXT,
+            calendar TEXT DEFAULT '',
+            is_manager INTEGER DEFAULT 0,
+            registration_ts INTEGER
+        )
+    ''')
+    
+    cursor = await DB.execute("PRAGMA table_info(users)")
+    columns = {row[1] for row in await cursor.fetchall()}
+    
+    if "company_name" not in columns:
+        await DB.execute("ALTER TABLE users ADD COLUMN company_name TEXT DEFAULT ''")
         
-        await db.commit()
+    if "calendar" not in columns:
+        await DB.execute("ALTER TABLE users ADD COLUMN calendar TEXT DEFAULT ''")
+    
+    if "is_manager" not in columns:
+        await DB.execute("ALTER TABLE users ADD COLUMN is_manager INTEGER DEFAULT 0")
+        cursor = await DB.execute("SELECT user_id, position FROM users")
+        await DB.executemany(
+            "UPDATE users SET is_manager = ? WHERE user_id = ?",
+            [(int(is_managing_position(position)), user_id) for user_id, position in await cursor.fetchall()]
+        )
+    
+    if "registration_ts" not in columns:
+        await DB.execute("ALTER TABLE users ADD COLUMN registration_ts INTEGER")
+        await DB.execute(
+            "UPDATE users SET registration_ts = CAST(strftime('%s', registration_date) AS INTEGER)"
+        )
+    
+    await DB.execute("CREATE INDEX IF NOT EXISTS idx_users_company ON users(company_name)")
+    
+    await DB.execute('''
+        CREATE TABLE IF NOT EXISTS user_events (
+            user_id INTEGER NOT NULL,
+            event_name TEXT NOT NULL,
+            added_at TEXT NOT NULL,
+            PRIMARY KEY (user_id, event_name)
+        )
+    ''')
+    await migrate_legacy_calendars()
+    
+    await DB.commit()
     print("Database initialized with company and calendar support")
 
+async def migrate_legacy_calendars():
+    cursor = await DB.execute("SELECT user_id, calendar FROM users WHERE COALESCE(calendar, '') != ''")
+    rows = await cursor.fetchall()
+    if not rows:
+        return
+    
+    added_at = datetime.utcnow().isoformat()
+    await DB.executemany(
+        "INSERT OR IGNORE INTO user_events (user_id, event_name, added_at) VALUES (?, ?, ?)",
+        [
+            (user_id, event.strip(), added_at)
+            for user_id, calendar in rows
+            for event in calendar.split(';') if event.strip()
+        ]
+    )
+    await DB.execute("UPDATE users SET calendar = ''")
+
 def is_managing_position(position: str) -> bool:
-    position_lower = position.lower().strip()
-    return any(manager_pos in position_lower for manager_pos in MANAGING_POSITIONS)
+    return _MGR_RE.search(position) is not None
 
 def is_valid_email(email):
-    pattern = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
-    return re.match(pattern, email) is not None
+    return _EMAIL_RE.match(email) is not None
 
 def format_events(events, include_index=True):
     if not events:
         return "Не удалось найти актуальные мероприятия. Попробуйте позже или уточните запрос."
     
-    response = "✨ <b>Актуальные IT-мероприятия:</b>\n\n"
+    parts = ["✨ <b>Актуальные IT-мероприятия:</b>\n\n"]
     for i, event in enumerate(events[:5], 1):
         index_str = f"{i}. " if include_index else ""
-        event_str = f"<b>{index_str}{event.get('Event Name', 'Без названия')}</b>\n"
-        start_date = event.get('Start Date', 'Не указана')
-        end_date = event.get('End Date', 'Не указана')
-        year = event.get('Year', '')
-        event_str += f"📅 <b>Даты:</b> {start_date} - {end_date}, {year}\n"
-        event_str += f"📍 <b>Место:</b> {event.get('Location', 'Не указано')}\n"
-        event_str += f"🔖 <b>Тип:</b> {event.get('Event Type', 'Не указан')}\n"
-        description = event.get('Description', 'Нет описания')[:150] + "..." if event.get('Description') else "Нет описания"
-        event_str += f"📝 <b>Описание:</b> {description}\n"
-        event_str += f"🎤 <b>Спикеры:</b> {event.get('Speakers/Organizers', 'Не указаны')}\n"
-        event_str += f"👥 <b>Участники:</b> {event.get('Participants Count', 'Неизвестно')}\n"
-        event_str += f"🔖 <b>Категория:</b> {event.get('Category', 'Не указана')}\n\n"
-        response += event_str
+        start_date = event.get(K_START, 'Не указана')
+        end_date = event.get(K_END, 'Не указана')
+        year = event.get(K_YEAR, '')
+        description = event.get(K_DESCRIPTION)
+        description = description[:150] + "..." if description else "Нет описания"
+        parts.append(
+            f"<b>{index_str}{event.get(K_NAME, 'Без названия')}</b>\n"
+            f"📅 <b>Даты:</b> {start_date} - {end_date}, {year}\n"
+            f"📍 <b>Место:</b> {event.get(K_LOCATION, 'Не указано')}\n"
+            f"🔖 <b>Тип:</b> {event.get(K_TYPE, 'Не указан')}\n"
+            f"📝 <b>Описание:</b> {description}\n"
+            f"🎤 <b>Спикеры:</b> {event.get(K_SPEAKERS, 'Не указаны')}\n"
+            f"👥 <b>Участники:</b> {event.get(K_PARTICIPANTS, 'Неизвестно')}\n"
+            f"🔖 <b>Категория:</b> {event.get(K_CATEGORY, 'Не указана')}\n\n"
+        )
     
     if include_index:
-        response += "\nℹ️ Чтобы получить подробную информацию о мероприятии, используйте <b>Поиск по архиву</b>"
-    return response
+        parts.append("\nℹ️ Чтобы получить подробную информацию о мероприятии, используйте <b>Поиск по архиву</b>")
+    return "".join(parts)
 
-def format_calendar_events(calendar_str):
-    if not calendar_str or calendar_str.strip() == "":
-        return "Ваш календарь пуст. Запишитесь на мероприятия!"
-    
-    events = [event.strip() for event in calendar_str.split(';') if event.strip()]
+def format_calendar_events(events):
     if not events:
         return "Ваш календарь пуст. Запишитесь на мероприятия!"
     
-    response = "📅 <b>Ваш календарь мероприятий:</b>\n\n"
-    for i, event in enumerate(events, 1):
-        response += f"{i}. {event}\n"
-    
-    return response
+    parts = ["📅 <b>Ваш календарь мероприятий:</b>\n\n"]
+    parts.extend(f"{i}. {event}\n" for i, event in enumerate(events, 1))
+    return "".join(parts)
 
 def format_rag_results(results):
     if not results:
         return "По вашему запросу ничего не найдено в архиве."
     
-    response = "📚 <b>Результаты поиска по архиву:</b>\n\n"
+    parts = ["📚 <b>Результаты поиска по архиву:</b>\n\n"]
     for i, result in enumerate(results[:5], 1):
         if isinstance(result, dict):
             formatted = "\n".join([f"<b>{key}:</b> {value}" for key, value in result.items() if value and value != "N/A"])
             if formatted:
-                response += f"{i}. {formatted}\n\n"
+                parts.append(f"{i}. {formatted}\n\n")
         else:
-            response += f"{i}. {str(result)}\n\n"
-    return response
+            parts.append(f"{i}. {str(result)}\n\n")
+    return "".join(parts)
 
-def get_main_menu(is_manager=False):
+def _store_result(key: tuple[str, str], task: asyncio.Task):
+    _RESULT_INFLIGHT.pop(key, None)
+    if task.cancelled() or task.exception() is not None or not task.result():
+        return
+    _RESULT_CACHE[key] = (time.monotonic(), task.result())
+    _RESULT_CACHE.move_to_end(key)
+    while len(_RESULT_CACHE) > RESULT_CACHE_MAX:
+        _RESULT_CACHE.popitem(last=False)
+
+async def _cached_call(kind: str, func, query: str, ttl: float, pool: ThreadPoolExecutor = None):
+    key = (kind, query.strip().lower())
+    cached = _RESULT_CACHE.get(key)
+    if cached and time.monotonic() - cached[0] < ttl:
+        _RESULT_CACHE.move_to_end(key)
+        return cached[1]
+    
+    task = _RESULT_INFLIGHT.get(key)
+    if task is None:
+        if asyncio.iscoroutinefunction(func):
+            task = asyncio.ensure_future(func(query))
+        else:
+            task = asyncio.ensure_future(asyncio.get_running_loop().run_in_executor(pool, func, query))
+        _RESULT_INFLIGHT[key] = task
+        task.add_done_callback(lambda t: _store_result(key, t))
+    return await asyncio.shield(task)
+
+async def get_events_cached(query: str):
+    return await _cached_call("events", GET_EVENTS, query, EVENTS_CACHE_TTL)
+
+async def run_rag_cached(query: str):
+    return await _cached_call("rag", run_RAG, query, RAG_CACHE_TTL, RAG_POOL)
+
+def format_registration_date(user_data):
+    s = user_data['registration_date'] or ''
+    if len(s) >= 16 and s[4] == '-' and s[7] == '-' and s[10] in 'T ' and s[13] == ':':
+        return f"{s[8:10]}.{s[5:7]}.{s[0:4]} {s[11:13]}:{s[14:16]}"
+    return datetime.fromtimestamp(user_data['registration_ts'], timezone.utc).strftime("%d.%m.%Y %H:%M")
+
+async def answer_in_chunks(message: Message, text: str):
+    for i in range(0, len(text), MESSAGE_LIMIT):
+        await message.answer(text[i:i + MESSAGE_LIMIT], parse_mode="HTML")
+
+def _build_main_menu(is_manager: bool):
     keyboard = InlineKeyboardBuilder()
     keyboard.button(text="🔍 Поиск по архиву", callback_data="search_archive")
     keyboard.button(text="🎯 Найти мероприятия", callback_data="find_events")
@@ -146,50 +289,107 @@ def get_main_menu(is_manager=False):
     keyboard.adjust(1)
     return keyboard.as_markup()
 
+_MENU_MGR = _build_main_menu(True)
+_MENU_USR = _build_main_menu(False)
+
+def get_main_menu(is_manager=False):
+    return _MENU_MGR if is_manager else _MENU_USR
+
+def _build_inline_keyboard(buttons, width: int = 1):
+    keyboard = InlineKeyboardBuilder()
+    for text, callback_data in buttons:
+        keyboard.button(text=text, callback_data=callback_data)
+    keyboard.adjust(width)
+    return keyboard.as_markup()
+
+_REGISTER_KB = _build_inline_keyboard([("✅ Зарегистрироваться", "start_registration")])
+_REREGISTER_KB = _build_inline_keyboard(
+    [("✅ Подтвердить", "confirm_reregister"), ("❌ Отмена", "cancel_reregister")], width=2
+)
+_SEARCH_KIND_KB = _build_inline_keyboard([
+    ("🔍 По моей должности", SearchCB(kind=SEARCH_BY_POSITION)),
+    ("✏️ Ввести свой запрос", SearchCB(kind=SEARCH_CUSTOM)),
+])
+_CALENDAR_KB = _build_inline_keyboard([
+    ("🧹 Очистить календарь", "clear_calendar"),
+    ("🏠 Вернуться в меню", "back_to_menu"),
+])
+_CALENDAR_EMPTY_KB = _build_inline_keyboard([("🏠 Вернуться в меню", "back_to_menu")])
+
+def _cached_user(user_id: int):
+    cached = _USER_CACHE.get(user_id)
+    if cached and time.monotonic() - cached[0] < USER_CACHE_TTL:
+        _USER_CACHE.move_to_end(user_id)
+        return True, cached[1]
+    return False, None
+
+def _cache_user(user_id: int, user):
+    _USER_CACHE[user_id] = (time.monotonic(), user)
+    _USER_CACHE.move_to_end(user_id)
+    while len(_USER_CACHE) > USER_CACHE_MAX:
+        evicted, _ = _USER_CACHE.popitem(last=False)
+        _USER_CACHE_LOCKS.pop(evicted, None)
+
+def invalidate_user_cache(user_id: int):
+    _USER_CACHE.pop(user_id, None)
+
+async def _fetch_user_data(user_id: int):
+    rows = await DB.execute_fetchall(
+        "SELECT * FROM users WHERE user_id = ?",
+        (user_id,)
+    )
+    return dict(rows[0]) if rows else None
+
 async def get_user_data(user_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            "SELECT * FROM users WHERE user_id = ?",
-            (user_id,)
-        )
-        user = await cursor.fetchone()
-        if user:
-            columns = [desc[0] for desc in cursor.description]
-            return dict(zip(columns, user))
-    return None
+    hit, user = _cached_user(user_id)
+    if not hit:
+        lock = _USER_CACHE_LOCKS.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            hit, user = _cached_user(user_id)
+            if not hit:
+                user = await _fetch_user_data(user_id)
+                _cache_user(user_id, user)
+    return dict(user) if user else None
 
 async def save_user_data(user_id: int, full_name: str, email: str, company_name: str, position: str, username: str = None):
-    unique_id = str(uuid.uuid4())
-    registration_date = datetime.utcnow().isoformat()
+    is_manager = int(is_managing_position(position))
+    user = None
+    
+    hit, cached = _cached_user(user_id)
+    if hit and cached:
+        cursor = await DB.execute('''
+            UPDATE users SET full_name = ?, email = ?, company_name = ?, position = ?, username = ?, is_manager = ?
+            WHERE user_id = ?
+            RETURNING *
+        ''', (full_name, email, company_name, position, username, is_manager, user_id))
+        user = await cursor.fetchone()
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            "SELECT user_id FROM users WHERE user_id = ?",
-            (user_id,)
-        )
-        exists = await cursor.fetchone()
-        
-        if exists:
-            await db.execute('''
-                UPDATE users SET full_name = ?, email = ?, company_name = ?, position = ?, username = ?
-                WHERE user_id = ?
-            ''', (full_name, email, company_name, position, username, user_id))
-        else:
-            await db.execute('''
-                INSERT INTO users 
-                (user_id, full_name, email, company_name, position, unique_id, registration_date, username, calendar)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, '')
-            ''', (user_id, full_name, email, company_name, position, unique_id, registration_date, username))
-        
-        await db.commit()
+    if user is None:
+        unique_id = str(uuid.uuid4())
+        registration_ts = int(time.time())
+        registration_date = datetime.fromtimestamp(registration_ts, timezone.utc).replace(tzinfo=None).isoformat()
         
-        cursor = await db.execute(
-            "SELECT * FROM users WHERE user_id = ?",
-            (user_id,)
-        )
+        cursor = await DB.execute('''
+            INSERT INTO users 
+            (user_id, full_name, email, company_name, position, unique_id, registration_date, registration_ts,
+             username, calendar, is_manager)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, '', ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                full_name = excluded.full_name,
+                email = excluded.email,
+                company_name = excluded.company_name,
+                position = excluded.position,
+                username = excluded.username,
+                is_manager = excluded.is_manager
+            RETURNING *
+        ''', (user_id, full_name, email, company_name, position, unique_id, registration_date, registration_ts,
+              username, is_manager))
         user = await cursor.fetchone()
-        columns = [desc[0] for desc in cursor.description]
-        return dict(zip(columns, user))
+    
+    user = dict(user)
+    await DB.commit()
+    _cache_user(user_id, user)
+    return dict(user)
 
 async def get_company_employees(manager_user_id: int):
     manager_data = await get_user_data(manager_user_id)
@@ -198,56 +398,47 @@ async def get_company_employees(manager_user_id: int):
     
     company_name = manager_data['company_name']
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute('''
-            SELECT user_id, full_name, position 
-            FROM users 
-            WHERE company_name = ? 
-            AND user_id != ? 
-            AND NOT EXISTS (
-                SELECT 1 FROM users u2 
-                WHERE u2.user_id = users.user_id 
-                AND (
-                    position LIKE '%директор%' OR 
-                    position LIKE '%руководитель%' OR 
-                    position LIKE '%начальник%' OR 
-                    position LIKE '%управляющий%' OR 
-                    position LIKE '%заместитель%' OR 
-                    position LIKE '%ceo%' OR 
-                    position LIKE '%coo%' OR 
-                    position LIKE '%cto%' OR 
-                    position LIKE '%cfo%' OR 
-                    position LIKE '%vp%'
-                )
-            )
-            ORDER BY full_name
-        ''', (company_name, manager_user_id))
-        
-        employees = await cursor.fetchall()
-        return [{"user_id": row[0], "full_name": row[1], "position": row[2]} for row in employees]
+    cursor = await DB.execute('''
+        SELECT user_id, full_name, position 
+        FROM users 
+        WHERE company_name = ? 
+        AND user_id != ? 
+        AND is_manager = 0
+        ORDER BY full_name
+    ''', (company_name, manager_user_id))
+    
+    employees = await cursor.fetchall()
+    return [{"user_id": row[0], "full_name": row[1], "position": row[2]} for row in employees]
 
 async def update_user_calendar(user_id: int, event_name: str):
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            "SELECT calendar FROM users WHERE user_id = ?",
-            (user_id,)
-        )
-        result = await cursor.fetchone()
-        
-        if result:
-            current_calendar = result[0] or ""
-            events = [e.strip() for e in current_calendar.split(';') if e.strip()]
-            if event_name not in events:
-                events.append(event_name)
-                new_calendar = "; ".join(events)
-                
-                await db.execute(
-                    "UPDATE users SET calendar = ? WHERE user_id = ?",
-                    (new_calendar, user_id)
-                )
-                await db.commit()
-                return True
-    return False
+    cursor = await DB.execute('''
+        INSERT OR IGNORE INTO user_events (user_id, event_name, added_at)
+        SELECT user_id, ?, ? FROM users WHERE user_id = ?
+    ''', (event_name, datetime.utcnow().isoformat(), user_id))
+    await DB.commit()
+    return cursor.rowcount > 0
+
+async def get_user_events(user_id: int):
+    cursor = await DB.execute(
+        "SELECT event_name FROM user_events WHERE user_id = ? ORDER BY added_at, rowid",
+        (user_id,)
+    )
+    return [row[0] for row in await cursor.fetchall()]
+
+async def resolve_is_manager(user_id: int, state: FSMContext) -> bool:
+    data = await state.get_data()
+    if "is_manager" in data:
+        return data["is_manager"]
+    user_data = await get_user_data(user_id)
+    is_manager = bool(user_data['is_manager']) if user_data else False
+    await state.update_data(is_manager=is_manager)
+    return is_manager
+
+async def reset_state(state: FSMContext):
+    data = await state.get_data()
+    await state.clear()
+    if "is_manager" in data:
+        await state.set_data({"is_manager": data["is_manager"]})
 
 @dp.message(Command("start"))
 async def cmd_start(message: Message, state: FSMContext):
@@ -255,7 +446,8 @@ async def cmd_start(message: Message, state: FSMContext):
     user_data = await get_user_data(user_id)
     
     if user_data:
-        is_manager = is_managing_position(user_data['position'])
+        is_manager = bool(user_data['is_manager'])
+        await state.update_data(is_manager=is_manager)
         await message.answer(
             f"С возвращением, {user_data['full_name']}! 👋\n\n"
             "Выберите действие:",
@@ -277,7 +469,7 @@ async def process_full_name(message: Message, state: FSMContext):
         await message.answer("ФИО слишком короткое. Пожалуйста, введите корректное ФИО (минимум 3 символа):")
         return
     
-    await state.update_data(full_name=full_name)
+    await state.set_data(asdict(RegDraft(full_name=full_name)))
     await message.answer("Отлично! Теперь введите ваш email:")
     await state.set_state(RegistrationStates.waiting_for_email)
 
@@ -289,7 +481,9 @@ async def process_email(message: Message, state: FSMContext):
         await message.answer("Некорректный email. Пожалуйста, введите правильный email в формате example@domain.com:")
         return
     
-    await state.update_data(email=email)
+    draft = RegDraft.from_data(await state.get_data())
+    draft.email = email
+    await state.set_data(asdict(draft))
     await message.answer("Отлично! Теперь введите название вашей компании:")
     await state.set_state(RegistrationStates.waiting_for_company)
 
@@ -301,7 +495,9 @@ async def process_company(message: Message, state: FSMContext):
         await message.answer("Название компании слишком короткое. Пожалуйста, введите корректное название (минимум 2 символа):")
         return
     
-    await state.update_data(company_name=company_name)
+    draft = RegDraft.from_data(await state.get_data())
+    draft.company_name = company_name
+    await state.set_data(asdict(draft))
     await message.answer("Отлично! Теперь введите вашу должность:")
     await state.set_state(RegistrationStates.waiting_for_position)
 
@@ -313,10 +509,10 @@ async def process_position(message: Message, state: FSMContext):
         await message.answer("Должность слишком короткая. Пожалуйста, введите корректную должность (минимум 2 символа):")
         return
     
-    data = await state.get_data()
-    full_name = data['full_name']
-    email = data['email']
-    company_name = data['company_name']
+    draft = RegDraft.from_data(await state.get_data())
+    full_name = draft.full_name
+    email = draft.email
+    company_name = draft.company_name
     
     try:
         user_data = await save_user_data(
@@ -344,7 +540,8 @@ async def process_position(message: Message, state: FSMContext):
         parse_mode="HTML"
     )
     
-    is_manager = is_managing_position(position)
+    is_manager = bool(user_data['is_manager'])
+    await state.update_data(is_manager=is_manager)
     manager_info = ""
     if is_manager:
         manager_info = "\n\n👑 Вы являетесь руководителем компании!\n" \
@@ -353,17 +550,10 @@ async def process_position(message: Message, state: FSMContext):
     await message.answer(f"{manager_info}🔍 Подбираю для вас персональные IT-мероприятия...\n(Это может занять до 30 секунд)")
     
     try:
-        events = await asyncio.to_thread(GET_EVENTS, position)
+        events = await get_events_cached(position)
         formatted_events = format_events(events)
         
-        if len(formatted_events) > 4096:
-            for i in range(0, len(formatted_events), 4096):
-                await message.answer(
-                    formatted_events[i:i+4096],
-                    parse_mode="HTML"
-                )
-        else:
-            await message.answer(formatted_events, parse_mode="HTML")
+        await answer_in_chunks(message, formatted_events)
             
     except Exception as e:
         await message.answer(
@@ -377,7 +567,7 @@ async def process_position(message: Message, state: FSMContext):
         parse_mode="HTML"
     )
 
-@dp.callback_query(lambda c: c.data == "register_employee")
+@dp.callback_query(F.data == "register_employee")
 async def register_employee_start(callback_query: types.CallbackQuery, state: FSMContext):
     await callback_query.answer()
     
@@ -385,15 +575,13 @@ async def register_employee_start(callback_query: types.CallbackQuery, state: FS
     user_data = await get_user_data(user_id)
     
     if not user_data:
-        keyboard = InlineKeyboardBuilder()
-        keyboard.button(text="✅ Зарегистрироваться", callback_data="start_registration")
         await callback_query.message.answer(
             "Для записи сотрудников на мероприятия необходимо зарегистрироваться. Хотите начать регистрацию?",
-            reply_markup=keyboard.as_markup()
+            reply_markup=_REGISTER_KB
         )
         return
     
-    if not is_managing_position(user_data['position']):
+    if not user_data['is_manager']:
         await callback_query.message.answer(
             "❌ У вас нет прав для записи сотрудников на мероприятия. Эта функция доступна только руководителям компаний."
         )
@@ -423,7 +611,7 @@ async def register_employee_start(callback_query: types.CallbackQuery, state: FS
     )
     await state.set_state(RegistrationStates.waiting_for_employee_selection)
 
-@dp.callback_query(lambda c: c.data.startswith("select_employee_"))
+@dp.callback_query(F.data.startswith("select_employee_"))
 async def select_employee_for_registration(callback_query: types.CallbackQuery, state: FSMContext):
     await callback_query.answer()
     
@@ -457,9 +645,7 @@ async def process_single_employee_event(message: Message, state: FSMContext):
     employee_name = data['selected_employee_name']
     
     success = await update_user_calendar(employee_id, event_name)
-    
-    user_data = await get_user_data(message.from_user.id)
-    is_manager = is_managing_position(user_data['position']) if user_data else False
+    is_manager = await resolve_is_manager(message.from_user.id, state)
     
     if success:
         await message.answer(
@@ -472,7 +658,7 @@ async def process_single_employee_event(message: Message, state: FSMContext):
             parse_mode="HTML"
         )
     
-    await state.clear()
+    await reset_state(state)
     
     await message.answer(
         "🎯 <b>Выберите следующее действие:</b>",
@@ -480,7 +666,7 @@ async def process_single_employee_event(message: Message, state: FSMContext):
         parse_mode="HTML"
     )
 
-@dp.callback_query(lambda c: c.data == "view_calendar")
+@dp.callback_query(F.data == "view_calendar")
 async def view_calendar(callback_query: types.CallbackQuery):
     await callback_query.answer()
     
@@ -488,50 +674,41 @@ async def view_calendar(callback_query: types.CallbackQuery):
     user_data = await get_user_data(user_id)
     
     if not user_data:
-        keyboard = InlineKeyboardBuilder()
-        keyboard.button(text="✅ Зарегистрироваться", callback_data="start_registration")
         await callback_query.message.answer(
             "Для просмотра календаря необходимо зарегистрироваться. Хотите начать регистрацию?",
-            reply_markup=keyboard.as_markup()
+            reply_markup=_REGISTER_KB
         )
         return
     
-    calendar_str = user_data['calendar']
-    formatted_calendar = format_calendar_events(calendar_str)
-    
-    keyboard = InlineKeyboardBuilder()
-    if calendar_str and calendar_str.strip() != "":
-        keyboard.button(text="🧹 Очистить календарь", callback_data="clear_calendar")
-    keyboard.button(text="🏠 Вернуться в меню", callback_data="back_to_menu")
-    keyboard.adjust(1)
+    events = await get_user_events(user_id)
+    formatted_calendar = format_calendar_events(events)
     
     await callback_query.message.answer(
         formatted_calendar,
         parse_mode="HTML",
-        reply_markup=keyboard.as_markup()
+        reply_markup=_CALENDAR_KB if events else _CALENDAR_EMPTY_KB
     )
 
-@dp.callback_query(lambda c: c.data == "clear_calendar")
+@dp.callback_query(F.data == "clear_calendar")
 async def clear_calendar(callback_query: types.CallbackQuery):
     await callback_query.answer()
     
     user_id = callback_query.from_user.id
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE users SET calendar = '' WHERE user_id = ?",
-            (user_id,)
-        )
-        await db.commit()
-    
+    await DB.execute(
+        "DELETE FROM user_events WHERE user_id = ?",
+        (user_id,)
+    )
+    await DB.commit()
+
     user_data = await get_user_data(user_id)
-    is_manager = is_managing_position(user_data['position']) if user_data else False
+    is_manager = bool(user_data['is_manager']) if user_data else False
     
     await callback_query.message.answer(
         "✅ Ваш календарь успешно очищен!",
         reply_markup=get_main_menu(is_manager)
     )
 
-@dp.callback_query(lambda c: c.data == "back_to_menu")
+@dp.callback_query(F.data == "back_to_menu")
 async def back_to_menu(callback_query: types.CallbackQuery):
     await callback_query.answer()
     
@@ -539,21 +716,19 @@ async def back_to_menu(callback_query: types.CallbackQuery):
     user_data = await get_user_data(user_id)
     
     if user_data:
-        is_manager = is_managing_position(user_data['position'])
+        is_manager = bool(user_data['is_manager'])
         await callback_query.message.answer(
             "🎯 <b>Выберите действие:</b>",
             reply_markup=get_main_menu(is_manager),
             parse_mode="HTML"
         )
     else:
-        keyboard = InlineKeyboardBuilder()
-        keyboard.button(text="✅ Зарегистрироваться", callback_data="start_registration")
         await callback_query.message.answer(
             "Вы не зарегистрированы. Пожалуйста, зарегистрируйтесь для доступа к функциям бота.",
-            reply_markup=keyboard.as_markup()
+            reply_markup=_REGISTER_KB
         )
 
-@dp.callback_query(lambda c: c.data == "find_events")
+@dp.callback_query(F.data == "find_events")
 async def process_find_events(callback_query: types.CallbackQuery, state: FSMContext):
     await callback_query.answer()
     
@@ -561,29 +736,30 @@ async def process_find_events(callback_query: types.CallbackQuery, state: FSMCon
     user_data = await get_user_data(user_id)
     
     if not user_data:
-        keyboard = InlineKeyboardBuilder()
-        keyboard.button(text="✅ Зарегистрироваться", callback_data="start_registration")
         await callback_query.message.answer(
             "Для поиска мероприятий необходимо зарегистрироваться. Хотите начать регистрацию?",
-            reply_markup=keyboard.as_markup()
+            reply_markup=_REGISTER_KB
         )
         return
     
-    keyboard = InlineKeyboardBuilder()
-    keyboard.button(text="🔍 По моей должности", callback_data=f"search_by_position_{user_data['position']}")
-    keyboard.button(text="✏️ Ввести свой запрос", callback_data="search_custom_query")
-    keyboard.adjust(1)
-    
     await callback_query.message.answer(
         "Выберите способ поиска актуальных мероприятий:",
-        reply_markup=keyboard.as_markup()
+        reply_markup=_SEARCH_KIND_KB
     )
 
-@dp.callback_query(lambda c: c.data.startswith("search_by_position_"))
+@dp.callback_query(SearchCB.filter(F.kind == SEARCH_BY_POSITION))
 async def search_by_position(callback_query: types.CallbackQuery):
     await callback_query.answer()
     
-    position = callback_query.data.split("search_by_position_")[1]
+    user_data = await get_user_data(callback_query.from_user.id)
+    if not user_data:
+        await callback_query.message.answer(
+            "Вы не зарегистрированы. Пожалуйста, зарегистрируйтесь для доступа к функциям бота.",
+            reply_markup=_REGISTER_KB
+        )
+        return
+    
+    position = user_data['position']
     
     processing_msg = await callback_query.message.answer(
         f"🔍 Ищу актуальные мероприятия по запросу: <b>{position}</b>\n(Это может занять до 30 секунд)",
@@ -591,16 +767,14 @@ async def search_by_position(callback_query: types.CallbackQuery):
     )
     
     try:
-        events = await asyncio.to_thread(GET_EVENTS, position)
+        events = await get_events_cached(position)
         formatted_events = format_events(events)
         
-        if len(formatted_events) > 4096:
-            await bot.delete_message(chat_id=callback_query.message.chat.id, message_id=processing_msg.message_id)
-            for i in range(0, len(formatted_events), 4096):
-                await callback_query.message.answer(
-                    formatted_events[i:i+4096],
-                    parse_mode="HTML"
-                )
+        if len(formatted_events) > MESSAGE_LIMIT:
+            await asyncio.gather(
+                bot.delete_message(chat_id=callback_query.message.chat.id, message_id=processing_msg.message_id),
+                answer_in_chunks(callback_query.message, formatted_events)
+            )
         else:
             await bot.edit_message_text(
                 chat_id=callback_query.message.chat.id,
@@ -616,9 +790,7 @@ async def search_by_position(callback_query: types.CallbackQuery):
             text=f"❌ Произошла ошибка при поиске: {str(e)}\nПопробуйте другой запрос или повторите позже."
         )
     
-    user_id = callback_query.from_user.id
-    user_data = await get_user_data(user_id)
-    is_manager = is_managing_position(user_data['position']) if user_data else False
+    is_manager = bool(user_data['is_manager'])
     
     await callback_query.message.answer(
         "🎯 <b>Выберите следующее действие:</b>",
@@ -626,7 +798,7 @@ async def search_by_position(callback_query: types.CallbackQuery):
         parse_mode="HTML"
     )
 
-@dp.callback_query(lambda c: c.data == "search_custom_query")
+@dp.callback_query(SearchCB.filter(F.kind == SEARCH_CUSTOM))
 async def search_custom_query(callback_query: types.CallbackQuery, state: FSMContext):
     await callback_query.answer()
     await callback_query.message.answer(
@@ -644,7 +816,7 @@ async def process_event_query(message: Message, state: FSMContext):
         await message.answer("Поисковый запрос слишком короткий. Пожалуйста, введите минимум 3 символа:")
         return
     
-    await state.clear()
+    await reset_state(state)
     
     processing_msg = await message.answer(
         f"🔍 Ищу актуальные мероприятия по запросу: <b>{query}</b>\n(Это может занять до 30 секунд)",
@@ -652,16 +824,14 @@ async def process_event_query(message: Message, state: FSMContext):
     )
     
     try:
-        events = await asyncio.to_thread(GET_EVENTS, query)
+        events = await get_events_cached(query)
         formatted_events = format_events(events)
         
-        if len(formatted_events) > 4096:
-            await bot.delete_message(chat_id=message.chat.id, message_id=processing_msg.message_id)
-            for i in range(0, len(formatted_events), 4096):
-                await message.answer(
-                    formatted_events[i:i+4096],
-                    parse_mode="HTML"
-                )
+        if len(formatted_events) > MESSAGE_LIMIT:
+            await asyncio.gather(
+                bot.delete_message(chat_id=message.chat.id, message_id=processing_msg.message_id),
+                answer_in_chunks(message, formatted_events)
+            )
         else:
             await bot.edit_message_text(
                 chat_id=message.chat.id,
@@ -677,9 +847,7 @@ async def process_event_query(message: Message, state: FSMContext):
             text=f"❌ Произошла ошибка при поиске: {str(e)}\nПопробуйте другой запрос или повторите позже."
         )
     
-    user_id = message.from_user.id
-    user_data = await get_user_data(user_id)
-    is_manager = is_managing_position(user_data['position']) if user_data else False
+    is_manager = await resolve_is_manager(message.from_user.id, state)
     
     await message.answer(
         "🎯 <b>Выберите следующее действие:</b>",
@@ -687,7 +855,7 @@ async def process_event_query(message: Message, state: FSMContext):
         parse_mode="HTML"
     )
 
-@dp.callback_query(lambda c: c.data == "search_archive")
+@dp.callback_query(F.data == "search_archive")
 async def process_search_archive(callback_query: types.CallbackQuery, state: FSMContext):
     await callback_query.answer()
     await callback_query.message.answer(
@@ -704,12 +872,12 @@ async def process_search_query(message: Message, state: FSMContext):
         await message.answer("Поисковый запрос слишком короткий. Пожалуйста, введите минимум 3 символа:")
         return
     
-    await state.clear()
+    await reset_state(state)
     
     processing_msg = await message.answer("🔍 Ищу информацию в архиве...\n(Это может занять до 20 секунд)")
     
     try:
-        results = await asyncio.to_thread(run_RAG, query)
+        results = await run_rag_cached(query)
         formatted_results = format_rag_results(results)
         
         await bot.edit_message_text(
@@ -726,9 +894,7 @@ async def process_search_query(message: Message, state: FSMContext):
             text=f"❌ Произошла ошибка при поиске: {str(e)}\nПопробуйте изменить запрос или повторить позже."
         )
     
-    user_id = message.from_user.id
-    user_data = await get_user_data(user_id)
-    is_manager = is_managing_position(user_data['position']) if user_data else False
+    is_manager = await resolve_is_manager(message.from_user.id, state)
     
     await message.answer(
         "🎯 <b>Выберите следующее действие:</b>",
@@ -736,14 +902,14 @@ async def process_search_query(message: Message, state: FSMContext):
         parse_mode="HTML"
     )
 
-@dp.callback_query(lambda c: c.data == "my_data")
+@dp.callback_query(F.data == "my_data")
 async def process_my_data(callback_query: types.CallbackQuery):
     await callback_query.answer()
     user_id = callback_query.from_user.id
     user_data = await get_user_data(user_id)
     
     if user_data:
-        reg_date = datetime.fromisoformat(user_data['registration_date']).strftime("%d.%m.%Y %H:%M")
+        reg_date = format_registration_date(user_data)
         
         response = (
             "<b>Ваши регистрационные данные:</b>\n\n"
@@ -756,21 +922,19 @@ async def process_my_data(callback_query: types.CallbackQuery):
             f"🔖 Username: @{user_data['username'] if user_data['username'] else 'не указан'}"
         )
         
-        is_manager = is_managing_position(user_data['position'])
+        is_manager = bool(user_data['is_manager'])
         await callback_query.message.answer(
             response,
             parse_mode="HTML",
             reply_markup=get_main_menu(is_manager)
         )
     else:
-        keyboard = InlineKeyboardBuilder()
-        keyboard.button(text="✅ Зарегистрироваться", callback_data="start_registration")
         await callback_query.message.answer(
             "Вы не зарегистрированы. Пожалуйста, зарегистрируйтесь для доступа к функциям бота.",
-            reply_markup=keyboard.as_markup()
+            reply_markup=_REGISTER_KB
         )
 
-@dp.callback_query(lambda c: c.data == "start_registration")
+@dp.callback_query(F.data == "start_registration")
 async def start_registration(callback_query: types.CallbackQuery, state: FSMContext):
     await callback_query.answer()
     await callback_query.message.answer(
@@ -785,7 +949,7 @@ async def cmd_mydata(message: Message):
     user_data = await get_user_data(user_id)
     
     if user_data:
-        reg_date = datetime.fromisoformat(user_data['registration_date']).strftime("%d.%m.%Y %H:%M")
+        reg_date = format_registration_date(user_data)
         
         response = (
             "<b>Ваши регистрационные данные:</b>\n\n"
@@ -798,18 +962,16 @@ async def cmd_mydata(message: Message):
             f"🔖 Username: @{user_data['username'] if user_data['username'] else 'не указан'}"
         )
         
-        is_manager = is_managing_position(user_data['position'])
+        is_manager = bool(user_data['is_manager'])
         await message.answer(
             response,
             parse_mode="HTML",
             reply_markup=get_main_menu(is_manager)
         )
     else:
-        keyboard = InlineKeyboardBuilder()
-        keyboard.button(text="✅ Зарегистрироваться", callback_data="start_registration")
         await message.answer(
             "Вы не зарегистрированы. Пожалуйста, зарегистрируйтесь для доступа к функциям бота.",
-            reply_markup=keyboard.as_markup()
+            reply_markup=_REGISTER_KB
         )
 
 @dp.message(Command("reregister"))
@@ -818,14 +980,9 @@ async def cmd_reregister(message: Message, state: FSMContext):
     user_data = await get_user_data(user_id)
     
     if user_data:
-        keyboard = InlineKeyboardBuilder()
-        keyboard.button(text="✅ Подтвердить", callback_data="confirm_reregister")
-        keyboard.button(text="❌ Отмена", callback_data="cancel_reregister")
-        keyboard.adjust(2)
-        
         await message.answer(
             "Вы уверены, что хотите перерегистрироваться? Это удалит ваши текущие данные.",
-            reply_markup=keyboard.as_markup()
+            reply_markup=_REREGISTER_KB
         )
     else:
         await message.answer(
@@ -833,28 +990,33 @@ async def cmd_reregister(message: Message, state: FSMContext):
             reply_markup=get_main_menu(False)
         )
 
-@dp.callback_query(lambda c: c.data == "confirm_reregister")
+@dp.callback_query(F.data == "confirm_reregister")
 async def confirm_reregister(callback_query: types.CallbackQuery, state: FSMContext):
     await callback_query.answer()
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "DELETE FROM users WHERE user_id = ?",
-            (callback_query.from_user.id,)
-        )
-        await db.commit()
-    
+    await DB.execute(
+        "DELETE FROM users WHERE user_id = ?",
+        (callback_query.from_user.id,)
+    )
+    await DB.execute(
+        "DELETE FROM user_events WHERE user_id = ?",
+        (callback_query.from_user.id,)
+    )
+    await DB.commit()
+    invalidate_user_cache(callback_query.from_user.id)
+    await state.clear()
+
     await callback_query.message.answer(
         "Ваши старые данные удалены. Давайте начнем регистрацию заново.\n\nВведите ваше ФИО:",
         reply_markup=types.ReplyKeyboardRemove()
     )
     await state.set_state(RegistrationStates.waiting_for_full_name)
 
-@dp.callback_query(lambda c: c.data == "cancel_reregister")
+@dp.callback_query(F.data == "cancel_reregister")
 async def cancel_reregister(callback_query: types.CallbackQuery):
     await callback_query.answer()
     user_data = await get_user_data(callback_query.from_user.id)
-    is_manager = is_managing_position(user_data['position']) if user_data else False
+    is_manager = bool(user_data['is_manager']) if user_data else False
     await callback_query.message.answer(
         "Перерегистрация отменена. Вы можете продолжить использовать бота.",
         reply_markup=get_main_menu(is_manager)
@@ -863,7 +1025,7 @@ async def cancel_reregister(callback_query: types.CallbackQuery):
 @dp.message()
 async def handle_other_messages(message: Message):
     user_data = await get_user_data(message.from_user.id)
-    is_manager = is_managing_position(user_data['position']) if user_data else False
+    is_manager = bool(user_data['is_manager']) if user_data else False
     await message.answer(
         "Я бот для поиска IT-мероприятий 🤖\n\n"
         "Пожалуйста, выберите действие из меню ниже:",
@@ -871,9 +1033,17 @@ async def handle_other_messages(message: Message):
     )
 
 async def main():
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=config.MAX_WORKERS, thread_name_prefix="default")
+    )
     await init_db()
     print("Бот запущен с поддержкой компаний и календаря...")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await DB.close()
+        await shutdown_parser()
+        RAG_POOL.shutdown(wait=False, cancel_futures=True)
 
 if __name__ == "__main__":
     asyncio.run(main())
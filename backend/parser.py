@@ -1,108 +1,204 @@
+import asyncio
 import hashlib
 import re
-import time
+import string
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
-from urllib.parse import urlparse, unquote
-import requests
-from bs4 import BeautifulSoup
+from html import unescape
+from urllib.parse import urlsplit, parse_qs
+import httpx
+from selectolax.lexbor import LexborHTMLParser as HTMLParser
 import logging
-from gemma_inference import GET_LLM_ANSWER
+from gemma_inference import GET_LLM_ANSWERS
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
 
 logger = logging.getLogger(__name__)
 
+FETCH_CONCURRENCY = 8
+MAX_PAGE_BYTES = 512 * 1024
+LLM_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm")
+
+_RE_WS = re.compile(r'\s+')
+_RE_GARBAGE = re.compile(r'[ÐÑÐ]{3,}')
+_RE_HREF = re.compile(r'href=["\']((?:https?:)?//[^"\']+)["\']')
+_RE_DATE = re.compile(
+    r'(?P<dmy>(?P<dmy_d>\d{1,2})[./-](?P<dmy_m>\d{1,2})[./-](?P<dmy_y>\d{4}))'
+    r'|(?P<ymd>(?P<ymd_y>\d{4})[./-](?P<ymd_m>\d{1,2})[./-](?P<ymd_d>\d{1,2}))'
+    r'|(?P<dmwy>(?P<dmwy_d>\d{1,2})\s+(?P<dmwy_m>[а-яА-Я]+)\s+(?P<dmwy_y>\d{4}))'
+    r'|(?P<dmw>(?P<dmw_d>\d{1,2})\s+(?P<dmw_m>[а-яА-Я]+))'
+)
+_MONTHS = {
+    'янв': 1, 'фев': 2, 'мар': 3, 'апр': 4, 'мая': 5, 'май': 5,
+    'июн': 6, 'июл': 7, 'авг': 8, 'сен': 9, 'окт': 10, 'ноя': 11, 'дек': 12,
+}
+
+_TITLE_LETTERS = frozenset(string.ascii_letters + 'ёЁ' + ''.join(map(chr, range(0x0410, 0x0450))))
+_GARBAGE_CHARS = frozenset('ÐÑ')
+
+_CONTENT_SELECTOR = '[class*=content], [class*=main], [class*=article]'
+_NOISE_TAGS = ['script', 'style', 'header', 'footer', 'nav', 'noscript', 'iframe', 'svg']
+_JSONLD_EVENT_TYPES = frozenset(['Event', 'BusinessEvent', 'EducationEvent'])
+
+_CLIENT: Optional[httpx.AsyncClient] = None
+
+def _get_client() -> httpx.AsyncClient:
+    global _CLIENT
+    if _CLIENT is None or _CLIENT.is_closed:
+        _CLIENT = httpx.AsyncClient(
+            http2=True,
+            timeout=10.0,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=20)
+        )
+    return _CLIENT
+
+async def shutdown():
+    global _CLIENT
+    if _CLIENT is not None and not _CLIENT.is_closed:
+        await _CLIENT.aclose()
+    _CLIENT = None
+    LLM_POOL.shutdown(wait=False, cancel_futures=True)
+
+def _iter_jsonld_nodes(node):
+    if isinstance(node, list):
+        for item in node:
+            yield from _iter_jsonld_nodes(item)
+    elif isinstance(node, dict):
+        yield node
+        for key in ('@graph', 'itemListElement', 'item'):
+            if key in node:
+                yield from _iter_jsonld_nodes(node[key])
+
+def _jsonld_text(value) -> str:
+    if isinstance(value, list):
+        return ', '.join(filter(None, (_jsonld_text(v) for v in value)))
+    if isinstance(value, dict):
+        address = value.get('address')
+        if isinstance(address, dict):
+            address = address.get('addressLocality') or address.get('streetAddress')
+        return _jsonld_text(value.get('name') or address or '')
+    return str(value).strip() if value else ''
+
+def _find_json_object(text: str) -> Optional[str]:
+    start = text.find('{')
+    if start < 0:
+        return None
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+def _jsonld_date(value) -> Optional[datetime]:
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.strip().replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        return None
+
 class DuckDuckGoSearch:
+    _ALLOWED_TLDS = ('.ru', '.su', '.рф', '.moscow', '.tech', '.com', '.org', '.net')
+    _BLOCK_DOMAINS = ('duckduckgo', 'yandex', 'google', 'vk')
+
     def __init__(self, cache_size: int = 200, cache_ttl: int = 1800):
         self.cache: OrderedDict = OrderedDict()
         self.cache_ttl = cache_ttl
-        self.cache_timestamps: Dict[str, datetime] = {}
         self.cache_size = cache_size
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
             'Accept-Language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
             'Referer': 'https://duckduckgo.com/',
             'Upgrade-Insecure-Requests': '1'
-        })
+        }
     
     def _generate_cache_key(self, query: str) -> str:
         salt = "ddg_v2"
-        normalized = re.sub(r'\s+', ' ', query.lower().strip())
+        normalized = _RE_WS.sub(' ', query.lower().strip())
         return hashlib.sha256(f"{normalized}{salt}".encode('utf-8')).hexdigest()
     
     def _is_ru_domain(self, url: str) -> bool:
         try:
-            parsed = urlparse(url)
-            domain = parsed.netloc.lower()
-            allowed = ['.ru', '.su', '.рф', '.moscow', '.tech', '.com', '.org', '.net']
-            return any(domain.endswith(tld) or f".{tld}" in domain for tld in allowed)
+            return urlsplit(url).netloc.lower().endswith(self._ALLOWED_TLDS)
         except:
             return False
 
     def _clean_url(self, raw_url: str) -> Optional[str]:
         try:
-            if 'duckduckgo.com/l/?uddg=' in raw_url:
-                match = re.search(r'uddg=([^&]+)', raw_url)
-                if match:
-                    raw_url = unquote(match.group(1))
-            
             raw_url = raw_url.strip()
-            if not raw_url.startswith(('http://', 'https://')):
-                return None
-                
-            parsed = urlparse(raw_url)
-            if not parsed.netloc:
+            parsed = urlsplit(raw_url)
+            if parsed.netloc.endswith('duckduckgo.com') and parsed.path.startswith('/l/'):
+                target = parse_qs(parsed.query).get('uddg')
+                if not target:
+                    return None
+                raw_url = target[0].strip()
+                parsed = urlsplit(raw_url)
+            
+            if parsed.scheme not in ('http', 'https') or not parsed.netloc:
                 return None
                 
-            if 'duckduckgo' in parsed.netloc or 'yandex' in parsed.netloc or 'google' in parsed.netloc or 'vk' in parsed.netloc:
+            if any(blocked in parsed.netloc for blocked in self._BLOCK_DOMAINS):
                 return None
                 
             return raw_url
         except:
             return None
     
-    def search(self, query: str) -> List[str]:
+    async def search(self, query: str) -> List[str]:
         cache_key = self._generate_cache_key(query)
-        if cache_key in self.cache and (datetime.now() - self.cache_timestamps.get(cache_key, datetime.min)).total_seconds() < self.cache_ttl:
-            return self.cache[cache_key]
+        cached = self.cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < self.cache_ttl:
+            self.cache.move_to_end(cache_key)
+            return list(cached[1])
 
         logger.info(f"DDG QUERY: {query}...")
         url = "https://html.duckduckgo.com/html/"
         data = {'q': query, 'kl': 'ru-ru', 'df': 'y'}
 
         try:
-            resp = self.session.post(url, data=data, timeout=15)
+            resp = await _get_client().post(url, data=data, headers=self.headers, timeout=15)
             resp.raise_for_status()
             
             urls = []
             seen = set()
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            links = soup.find_all('a', class_='result__a')
-            
-            for link_tag in links:
-                href = link_tag.get('href')
-                if not href: continue
-                
-                clean = self._clean_url(href)
-                if clean and clean not in seen:
-                    if self._is_ru_domain(clean):
-                        urls.append(clean)
-                        seen.add(clean)
-            
-            if not urls:
-                raw_links = re.findall(r'href=["\'](https?://[^"\']+)["\']', resp.text)
-                for href in raw_links:
-                    clean = self._clean_url(href)
-                    if clean and clean not in seen and self._is_ru_domain(clean):
-                        urls.append(clean)
-                        seen.add(clean)
-
-            self.cache[cache_key] = urls[:10]
-            self.cache_timestamps[cache_key] = datetime.now()
+            for href in _RE_HREF.findall(resp.text):
+                clean = self._clean_url(unescape(href))
+                if clean and clean not in seen and self._is_ru_domain(clean):
+                    urls.append(clean)
+                    seen.add(clean)
+                    if len(urls) == 10:
+                        break
+
+            self.cache[cache_key] = (time.monotonic(), urls[:10])
+            self.cache.move_to_end(cache_key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
             return urls[:10]
 
         except Exception as e:
@@ -110,83 +206,143 @@ class DuckDuckGoSearch:
             return []
 
 class EventParser:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
+    def __init__(self, cache_size: int = 512, cache_ttl: int = 86400):
+        self.cache: OrderedDict = OrderedDict()
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (compatible; EventBot/1.0)',
             'Accept-Language': 'ru-RU,ru;q=0.9',
-        })
-
-        self.date_patterns = [
-            r'(\d{1,2})[./-](\d{1,2})[./-](\d{4})',
-            r'(\d{4})[./-](\d{1,2})[./-](\d{1,2})',
-            r'(\d{1,2})\s+([а-яА-Я]+)\s+(\d{4})',
-            r'(\d{1,2})\s+([а-яА-Я]+)'
-        ]
-        self.months = {
-            'янв': 1, 'января': 1, 'январь': 1,
-            'фев': 2, 'февраля': 2, 'февраль': 2,
-            'мар': 3, 'марта': 3, 'март': 3,
-            'апр': 4, 'апреля': 4, 'апрель': 4,
-            'мая': 5, 'май': 5,
-            'июн': 6, 'июня': 6, 'июнь': 6,
-            'июл': 7, 'июля': 7, 'июль': 7,
-            'авг': 8, 'августа': 8, 'август': 8,
-            'сен': 9, 'сентября': 9, 'сентябрь': 9,
-            'окт': 10, 'октября': 10, 'октябрь': 10,
-            'ноя': 11, 'ноября': 11, 'ноябрь': 11,
-            'дек': 12, 'декабря': 12, 'декабрь': 12,
         }
     
-    def get_soup(self, url: str) -> Optional[BeautifulSoup]:
+    def cached_result(self, url: str) -> Optional[Dict[str, Any]]:
+        cached = self.cache.get(url)
+        if cached and time.monotonic() - cached[0] < self.cache_ttl:
+            self.cache.move_to_end(url)
+            return dict(cached[1])
+        return None
+
+    def remember(self, url: str, data: Dict[str, Any]):
+        if not data['Event Name']:
+            return
+        self.cache[url] = (time.monotonic(), dict(data))
+        self.cache.move_to_end(url)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+    
+    async def fetch_html(self, url: str) -> Optional[str]:
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            if response.encoding is None:
-                response.encoding = 'utf-8'
-            return BeautifulSoup(response.text, 'html.parser')
+            async with _get_client().stream('GET', url, headers=self.headers) as response:
+                response.raise_for_status()
+                body = bytearray()
+                async for chunk in response.aiter_bytes(8192):
+                    body += chunk
+                    if len(body) >= MAX_PAGE_BYTES:
+                        break
+                encoding = response.encoding or 'utf-8'
+            return body[:MAX_PAGE_BYTES].decode(encoding, errors='replace')
         except Exception:
             return None
 
-    def _get_meta(self, soup: BeautifulSoup, attrs_list: List[Dict]) -> str:
+    def _get_meta(self, tree: HTMLParser, attrs_list: List[Dict]) -> str:
         for attrs in attrs_list:
-            tag = soup.find('meta', attrs=attrs)
-            if tag and tag.get('content'):
-                return tag['content'].strip()
+            selector = 'meta' + ''.join(f'[{k}="{v}"]' for k, v in attrs.items())
+            tag = tree.css_first(selector)
+            if tag and tag.attributes.get('content'):
+                return tag.attributes['content'].strip()
         return ""
 
     def _is_valid_title(self, title: str) -> bool:
         if not title or len(title) < 5:
             return False
         
-        has_cyrillic = bool(re.search('[а-яА-ЯёЁ]', title))
-        has_latin = bool(re.search('[a-zA-Z]', title))
-        has_garbage = bool(re.search(r'[ÐÑÐ]{3,}', title)) # and not has_garbage
-        
-        return (has_cyrillic or has_latin) and not has_garbage
+        if _TITLE_LETTERS.isdisjoint(title):
+            return False
+        return _GARBAGE_CHARS.isdisjoint(title) or not _RE_GARBAGE.search(title)
 
-    def _extract_relevant_content(self, soup: BeautifulSoup, max_length: int = 1500) -> str:
-        for element in soup(["script", "style", "header", "footer", "nav"]):
-            element.decompose()
+    def _extract_relevant_content(self, tree: HTMLParser, max_length: int = 1500) -> str:
+        tree.strip_tags(_NOISE_TAGS)
+        
+        root = (tree.css_first('main') or tree.css_first('#content')
+                or tree.css_first(_CONTENT_SELECTOR) or tree.body or tree.root)
         
-        main_content = soup.find('main') or soup.find(id='content') or soup.find(class_=re.compile(r'(content|main|article)'))
-        if main_content:
-            text = main_content.get_text(" ", strip=True)
-        else:
-            text = soup.get_text(" ", strip=True)
+        parts = []
+        size = -1
+        for node in root.traverse(include_text=True):
+            if node.tag != '-text':
+                continue
+            chunk = _RE_WS.sub(' ', node.text_content.strip())
+            if chunk:
+                parts.append(chunk)
+                size += len(chunk) + 1
+                if size > max_length:
+                    break
         
-        text = re.sub(r'\s+', ' ', text)
+        text = ' '.join(parts)
         return text[:max_length] + "..." if len(text) > max_length else text
 
+    def _try_jsonld(self, tree: HTMLParser) -> Optional[dict]:
+        for script in tree.css('script[type="application/ld+json"]'):
+            try:
+                payload = json.loads(script.text())
+            except ValueError:
+                continue
+            for node in _iter_jsonld_nodes(payload):
+                types = node.get('@type')
+                if isinstance(types, str):
+                    types = [types]
+                if isinstance(types, list) and not _JSONLD_EVENT_TYPES.isdisjoint(types):
+                    return node
+        return None
+
+    def _fill_from_jsonld(self, data: Dict[str, Any], event: dict) -> bool:
+        location = _jsonld_text(event.get('location'))
+        if not location and 'Online' in str(event.get('eventAttendanceMode', '')):
+            location = 'Онлайн'
+
+        return self._fill_event(data, {
+            'Event Name': _jsonld_text(event.get('name')),
+            'Start Date': event.get('startDate'),
+            'End Date': event.get('endDate'),
+            'Location': location,
+            'Description': _jsonld_text(event.get('description')),
+            'Speakers/Organizers': _jsonld_text(event.get('organizer') or event.get('performer')),
+            'Partners': _jsonld_text(event.get('sponsor')),
+        })
+
+    def _fill_event(self, data: Dict[str, Any], fields: Dict[str, Any]) -> bool:
+        name = fields.get('Event Name') or ''
+        if not self._is_valid_title(name):
+            return False
+        start = _jsonld_date(fields.get('Start Date')) or self._parse_date_string(fields.get('Start Date'))
+        if not start:
+            return False
+        end = _jsonld_date(fields.get('End Date')) or self._parse_date_string(fields.get('End Date')) or start
+
+        data['Event Name'] = name
+        data['Event Type'] = 'Мероприятие'
+        data['Description'] = (fields.get('Description') or '')[:250]
+        data['Start Date'] = start.strftime("%d.%m.%Y")
+        data['End Date'] = end.strftime("%d.%m.%Y")
+        data['Year'] = str(start.year)
+        data['Location'] = fields.get('Location') or ''
+        data['Speakers/Organizers'] = (fields.get('Speakers/Organizers') or '')[:100]
+        data['Partners'] = (fields.get('Partners') or '')[:100]
+        data['Parsed Date'] = start
+        return True
+
     def _parse_llm_response(self, response: str) -> dict:
+        if not response:
+            logger.warning("Empty LLM response")
+            return {}
         try:
-            return json.loads(response)
-        except json.JSONDecodeError:
-            match = re.search(r'\{.*\}', response, re.DOTALL)
-            if match:
+            return _json_loads(response)
+        except ValueError:
+            candidate = _find_json_object(response)
+            if candidate:
                 try:
-                    return json.loads(match.group())
-                except:
+                    return _json_loads(candidate)
+                except ValueError:
                     pass
         
         logger.warning(f"Failed to parse LLM response: {response[:100]}...")
@@ -199,29 +355,25 @@ class EventParser:
         if current_year is None:
             current_year = datetime.now().year
         
-        for pattern in self.date_patterns:
-            match = re.search(pattern, date_str)
-            if not match:
-                continue
-            
-            groups = match.groups()
+        textual = None
+        match = _RE_DATE.search(date_str)
+        while match:
+            kind = match.lastgroup
             try:
-                if len(groups) == 3:
-                    if pattern.startswith(r'(\d{4})'):
-                        year, month, day = map(int, groups)
-                    else:
-                        day, month, year = map(int, groups)
-                    return datetime(year, month, day)
+                day = int(match[f'{kind}_d'])
+                if kind in ('dmy', 'ymd'):
+                    return datetime(int(match[f'{kind}_y']), int(match[f'{kind}_m']), day)
                 
-                elif len(groups) == 2:
-                    day = int(groups[0])
-                    month_str = groups[1].lower()
-                    
-                    for key, month_num in self.months.items():
-                        if key in month_str:
-                            return datetime(current_year, month_num, day)
-            except (ValueError, TypeError):
-                continue
+                month = _MONTHS.get(match[f'{kind}_m'][:3].lower())
+                if month and textual is None:
+                    year = int(match['dmwy_y']) if kind == 'dmwy' else current_year
+                    textual = datetime(year, month, day)
+            except ValueError:
+                pass
+            match = _RE_DATE.search(date_str, match.end(f'{kind}_d'))
+        
+        if textual:
+            return textual
         
         try:
             return datetime.fromisoformat(date_str)
@@ -231,30 +383,40 @@ class EventParser:
         logger.warning(f"Could not parse date string: '{date_str}'")
         return None
 
-    def parse(self, url: str) -> Dict[str, Any]:
-        soup = self.get_soup(url)
+    async def prepare_prompt(self, url: str) -> Tuple[Dict[str, Any], Optional[str]]:
+        html = await self.fetch_html(url)
+        return await asyncio.to_thread(self._build_prompt, url, html)
+
+    def _build_prompt(self, url: str, html: Optional[str]) -> Tuple[Dict[str, Any], Optional[str]]:
         data = {k: '' for k in ['Year', 'Start Date', 'End Date', 'Event Name', 'Event Type', 
                                 'Description', 'Participants Count', 'Speakers/Organizers', 
                                 'Partners', 'Category', 'Location', 'Source URL', 'Parsed Date']}
         data['Source URL'] = url
         
-        if not soup:
-            return data
+        if not html:
+            return data, None
+        tree = HTMLParser(html)
+
+        event = self._try_jsonld(tree)
+        if event and self._fill_from_jsonld(data, event):
+            logger.debug(f"Using JSON-LD event data for URL: {url[:50]}...")
+            return data, None
 
-        title = self._get_meta(soup, [
+        title = self._get_meta(tree, [
             {'property': 'og:title'}, {'name': 'twitter:title'}, {'name': 'title'}
         ])
-        if not title and soup.title:
-            title = soup.title.string or ''
+        if not title:
+            title_tag = tree.css_first('title')
+            title = title_tag.text(strip=True) if title_tag else ''
         
         if not self._is_valid_title(title):
             logger.warning(f"Skipped invalid title: {title[:50]}...")
-            return data
+            return data, None
 
-        description = self._get_meta(soup, [
+        description = self._get_meta(tree, [
             {'property': 'og:description'}, {'name': 'description'}
         ])
-        content = self._extract_relevant_content(soup, max_length=1500)
+        content = self._extract_relevant_content(tree, max_length=1500)
         
         current_year = datetime.now().year
         prompt = f"""
@@ -282,10 +444,11 @@ class EventParser:
 3. Если поле неизвестно, оставь его пустым
 4. Никогда не используй формат "YYYY-MM-DD" для дат
 """
-        
+        return data, prompt.strip()
+
+    def finalize(self, data: Dict[str, Any], llm_response: Optional[str]) -> Dict[str, Any]:
+        current_year = datetime.now().year
         try:
-            logger.debug(f"Sending request to LLM for URL: {url[:50]}...")
-            llm_response = GET_LLM_ANSWER(prompt.strip())
             event_details = self._parse_llm_response(llm_response)
             
             field_mapping = {
@@ -318,61 +481,87 @@ class EventParser:
                     data['End Date'] = parsed_end.strftime("%d.%m.%Y")
         
         except Exception as e:
-            logger.error(f"LLM processing failed for {url}: {str(e)}")
+            logger.error(f"LLM processing failed for {data['Source URL']}: {str(e)}")
         
         return data
 
-def parse_events(query: str) -> Tuple[Dict[str, Any], ...]:
+_SEARCHER = DuckDuckGoSearch()
+_PARSER = EventParser()
+
+async def parse_events(query: str) -> Tuple[Dict[str, Any], ...]:
     today = datetime.now()
     logger.info(f"Starting event parsing for query: {query}")
     
-    searcher = DuckDuckGoSearch()
-    urls = searcher.search(query)
+    urls = await _SEARCHER.search(query)
     
     if not urls:
         logger.warning("No URLs found for the query")
         return tuple()
 
     logger.info(f"Found {len(urls)} URLs to process")
-    parser = EventParser()
+    parser = _PARSER
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def prepare_url(i: int, url: str) -> Tuple[Dict[str, Any], Optional[str]]:
+        cached = parser.cached_result(url)
+        if cached is not None:
+            logger.debug(f"Using cached result for URL {i}/{len(urls)}: {url}")
+            return cached, None
+        async with semaphore:
+            logger.debug(f"Processing URL {i}/{len(urls)}: {url}")
+            data, prompt = await parser.prepare_prompt(url)
+        if prompt is None:
+            parser.remember(url, data)
+        return data, prompt
+
+    prepared = await asyncio.gather(
+        *(prepare_url(i, url) for i, url in enumerate(urls, 1)), return_exceptions=True
+    )
+    pending = [item for item in prepared if not isinstance(item, Exception) and item[1]]
+    if pending:
+        logger.debug(f"Sending {len(pending)} prompts to LLM")
+        responses = await asyncio.get_running_loop().run_in_executor(
+            LLM_POOL, GET_LLM_ANSWERS, [prompt for _, prompt in pending]
+        )
+        for (data, _), response in zip(pending, responses):
+            parser.finalize(data, response)
+            parser.remember(data['Source URL'], data)
+
+    results = [item if isinstance(item, Exception) else item[0] for item in prepared]
     events = []
     added_count = 0
     skipped_count = 0
 
-    for i, url in enumerate(urls, 1):
-        try:
-            logger.debug(f"Processing URL {i}/{len(urls)}: {url}")
-            event_data = parser.parse(url)
-            
-            if not event_data['Event Name'] or not parser._is_valid_title(event_data['Event Name']):
-                logger.warning(f"Skipped invalid title for URL: {url}")
+    for url, event_data in zip(urls, results):
+        if isinstance(event_data, Exception):
+            logger.error(f"Error processing {url}: {str(event_data)}")
+            skipped_count += 1
+            continue
+
+        if not event_data['Event Name'] or not parser._is_valid_title(event_data['Event Name']):
+            logger.warning(f"Skipped invalid title for URL: {url}")
+            skipped_count += 1
+            continue
+        
+        parsed_date = event_data.get('Parsed Date')
+        if parsed_date:
+            if parsed_date < today:
+                logger.warning(f"Skipped past event ({parsed_date.strftime('%d.%m.%Y')}) for URL: {url}")
                 skipped_count += 1
                 continue
-            
-            parsed_date = event_data.get('Parsed Date')
-            if parsed_date:
-                if parsed_date < today:
-                    logger.warning(f"Skipped past event ({parsed_date.strftime('%d.%m.%Y')}) for URL: {url}")
-                    skipped_count += 1
-                    continue
-            
-            events.append(event_data)
-            added_count += 1
-            logger.info(f"Added event: {event_data['Event Name'][:60]}...")
-            time.sleep(1)
-            
-        except Exception as e:
-            logger.error(f"Error processing {url}: {str(e)}")
-            skipped_count += 1
+        
+        events.append(event_data)
+        added_count += 1
+        logger.info(f"Added event: {event_data['Event Name'][:60]}...")
 
     logger.info(f"Parsed events: {added_count} added, {skipped_count} skipped")
     return tuple(events)
 
-def GET_EVENTS(query: str):
+async def GET_EVENTS(query: str):
     if len(query.split(" ")) < 3:
         act_query = f"IT-мероприятия в Санкт-Петербурге для {query}"
     else:
         act_query = query
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-    events = parse_events(act_query)
+    events = await parse_events(act_query)
     return events
@@ -0,0 +1,30 @@
+from datetime import datetime
+
+import pytest
+
+for module in ('dotenv', 'httpx', 'selectolax', 'llama_cpp', 'psutil'):
+    pytest.importorskip(module)
+
+from parser import EventParser
+
+
+@pytest.fixture
+def event_parser():
+    return EventParser()
+
+
+@pytest.mark.parametrize('date_str, expected', [
+    ('12.06.2027', datetime(2027, 6, 12)),
+    ('2027-06-12', datetime(2027, 6, 12)),
+    ('5 мая 2027', datetime(2027, 5, 5)),
+    ('1 сентября', datetime(2026, 9, 1)),
+    ('с 5 по 12.06.2027', datetime(2027, 6, 12)),
+    ('3 дня, 12.06.2027', datetime(2027, 6, 12)),
+    ('с 5 мая по 12.06.2027', datetime(2027, 6, 12)),
+])
+def test_parse_date_string(event_parser, date_str, expected):
+    assert event_parser._parse_date_string(date_str, current_year=2026) == expected
+
+
+def test_parse_date_string_unparseable(event_parser):
+    assert event_parser._parse_date_string('3 дня', current_year=2026) is None
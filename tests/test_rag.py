@@ -0,0 +1,58 @@
+import pytest
+
+for module in ('dotenv', 'pyarrow', 'faiss', 'torch', 'sentence_transformers', 'transformers'):
+    pytest.importorskip(module)
+
+from RAG import ITEventSemanticSearch, _write_atomic
+
+
+def test_iter_text_batches_fills_missing_columns(tmp_path):
+    csv_path = tmp_path / 'events.csv'
+    csv_path.write_text(
+        'Event Name,Description\n'
+        'Митап,Про Python\n'
+        'Хакатон,\n'
+        'Митап,Дубликат\n',
+        encoding='utf-8'
+    )
+
+    names = []
+    texts = []
+    for batch_names, batch_texts in ITEventSemanticSearch._iter_text_batches(str(csv_path)):
+        names.extend(batch_names)
+        texts.extend(batch_texts)
+
+    assert names == ['Митап', 'Хакатон']
+    assert texts == ['Митап. Про Python. . ', 'Хакатон. . . ']
+
+
+def test_iter_text_batches_reads_multiline_values_across_blocks(tmp_path):
+    csv_path = tmp_path / 'events.csv'
+    rows = ''.join(f'Событие {i},"Первая строка {i}\nВторая строка {i}"\n' for i in range(30000))
+    csv_path.write_text('Event Name,Description\n' + rows, encoding='utf-8')
+    assert csv_path.stat().st_size > 1 << 20
+
+    names = []
+    texts = []
+    for batch_names, batch_texts in ITEventSemanticSearch._iter_text_batches(str(csv_path)):
+        names.extend(batch_names)
+        texts.extend(batch_texts)
+
+    assert len(names) == 30000
+    assert texts[-1] == 'Событие 29999. Первая строка 29999\nВторая строка 29999. . '
+
+
+def test_write_atomic_keeps_target_missing_on_failure(tmp_path):
+    target = tmp_path / 'cache.npy'
+
+    def write(path):
+        with open(path, 'wb') as f:
+            f.write(b'partial')
+        raise RuntimeError('killed')
+
+    with pytest.raises(RuntimeError):
+        _write_atomic(str(target), write)
+    assert list(tmp_path.iterdir()) == []
+
+    _write_atomic(str(target), lambda path: open(path, 'wb').close())
+    assert [p.name for p in tmp_path.iterdir()] == ['cache.npy']